@@ -338,11 +338,9 @@ class AutoscoperMWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
         if self._parameterNode is None or self._updatingGUIFromParameterNode:
             return
 
-        wasModified = self._parameterNode.StartModify()  # Modify all properties in a single batch
-
-        # NA
-
-        self._parameterNode.EndModify(wasModified)
+        with AutoscoperMLogic.batchModify(self._parameterNode):  # Modify all properties in a single batch
+            # NA
+            pass
 
     @property
     def autoscoperExecutableToLaunchBackend(self):
@@ -382,13 +380,16 @@ class AutoscoperMWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
             logging.error(f"Failed to load config file: {configPath} not found")
             return False
 
-        # Ensure that autoscoper is running
-        if self.logic.AutoscoperProcess.state() != qt.QProcess.Running and slicer.util.confirmYesNoDisplay(
+        # Ensure that autoscoper is running and connected
+        processState = self.logic.AutoscoperProcess.state()
+        if processState == qt.QProcess.Running and self.logic.AutoscoperSocket is None:
+            self.logic.connectToAutoscoper()  # e.g. after disconnectFromAutoscoper
+        elif processState == qt.QProcess.NotRunning and slicer.util.confirmYesNoDisplay(
             "Autoscoper is not running. Do you want to start Autoscoper?"
         ):
             self.startAutoscoper()
 
-        if self.logic.AutoscoperProcess.state() != qt.QProcess.Running:
+        if not self.logic.isAutoscoperOpen:
             logging.error("failed to load the Sample Data: Autoscoper is not running. ")
             return False
 
@@ -919,6 +920,27 @@ class AutoscoperMLogic(ScriptedLoadableModuleLogic):
     def IsSequenceVolume(node: Union[slicer.vtkMRMLNode, None]) -> bool:
         return isinstance(node, slicer.vtkMRMLSequenceNode)
 
+    @staticmethod
+    @contextlib.contextmanager
+    def batchModify(node: slicer.vtkMRMLNode):
+        """
+        Context manager grouping all the modifications of the node into a single ModifiedEvent.
+
+        EndModify is guaranteed to be called even if an exception is raised within the block.
+
+        :param node: node to modify
+        """
+        wasModified = node.StartModify()
+        try:
+            yield node
+        finally:
+            node.EndModify(wasModified)
+
+    @property
+    def isAutoscoperOpen(self) -> bool:
+        """Whether the Autoscoper process is running and the connection to it is established."""
+        return self.AutoscoperProcess.state() == qt.QProcess.Running and self.AutoscoperSocket is not None
+
     def setDefaultParameters(self, parameterNode):
         """
         Initialize parameter node with default settings.
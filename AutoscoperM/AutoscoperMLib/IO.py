@@ -1,6 +1,7 @@
 import logging
 import os
 from itertools import product
+from typing import Union
 
 import numpy as np
 import slicer
@@ -204,10 +205,13 @@ def writeTFMFile(filename: str, spacing: list[float], origin: list[float]):
     slicer.mrmlScene.RemoveNode(transformNode)
 
 
-def writeTRA(fileName: str, transforms: list[vtk.vtkMatrix4x4]) -> None:
-    rowWiseStrings = []
-    for transform in transforms:
-        rowWiseStrings.append([str(transform.GetElement(i, j)) for i, j in product(range(4), range(4))])
+def writeTRA(fileName: str, transforms: Union[list[vtk.vtkMatrix4x4], np.ndarray]) -> None:
+    if isinstance(transforms, np.ndarray):  # (N, 4, 4) array, written with the same formatting as the matrices
+        rowWiseStrings = [[str(value) for value in row] for row in transforms.reshape(-1, 16).tolist()]
+    else:
+        rowWiseStrings = []
+        for transform in transforms:
+            rowWiseStrings.append([str(transform.GetElement(i, j)) for i, j in product(range(4), range(4))])
     with open(fileName, "w+") as traFile:
         for row in rowWiseStrings:
             traFile.write(",".join(row) + "\n")
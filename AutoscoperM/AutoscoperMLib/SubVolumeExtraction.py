@@ -1,8 +1,10 @@
 import logging
 from typing import Optional
 
+import numpy as np
 import slicer
 import vtk
+from scipy import ndimage
 
 
 def automaticSegmentation(
@@ -70,13 +72,11 @@ def automaticSegmentation(
     segmentationNode.GetDisplayNode().GetVisibleSegmentIDs(inputSegmentIDs)
 
     # Fill Holes
-    segmentEditorNode.SetOverwriteMode(slicer.vtkMRMLSegmentEditorNode.OverwriteNone)
-    segmentEditorNode.SetMaskMode(slicer.vtkMRMLSegmentationNode.EditAllowedEverywhere)
-
+    spacing = tuple(reversed(volumeNode.GetSpacing()))  # KJI order, as the labelmap arrays
     numSegments = inputSegmentIDs.GetNumberOfValues()
     for i in range(numSegments):
         segmentID = inputSegmentIDs.GetValue(i)
-        _fillHole(segmentID, segmentationEditorWidget, marginSize)
+        _fillHole(segmentationNode, segmentID, volumeNode, marginSize, spacing)
         progress = ((i + 1) / numSegments) * 90 + 10
         progress = progress / 100 * maxProgressValue
         progressCallback(progress)
@@ -148,89 +148,74 @@ def mergeSegments(
     if newSegmentationNode:
         mergeNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentationNode")
         mergeNode.CreateDefaultDisplayNodes()  # only needed for display
+        mergeNode.GetSegmentation().DeepCopy(segmentationNode.GetSegmentation())  # copy segments over
         mergeNode.SetReferenceImageGeometryParameterFromVolumeNode(volumeNode)
-        # copy segments over
-        for i in range(segmentationNode.GetSegmentation().GetNumberOfSegments()):
-            segment = segmentationNode.GetSegmentation().GetNthSegment(i)
-            mergeNode.GetSegmentation().CopySegmentFromSegmentation(
-                segmentationNode.GetSegmentation(), segment.GetName()
-            )
         mergeNode.SetName(segmentationNode.GetName() + " merged")
 
-    # Create segment editor to get access to effects
-    segmentationEditorWidget = slicer.qMRMLSegmentEditorWidget()
-    segmentationEditorWidget.setMRMLScene(slicer.mrmlScene)
-    segmentEditorNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentEditorNode")
-    segmentationEditorWidget.setMRMLSegmentEditorNode(segmentEditorNode)
-    segmentationEditorWidget.setSegmentationNode(mergeNode)
-    segmentationEditorWidget.setSourceVolumeNode(volumeNode)
-
     # Merge Segments
     inputSegmentIDs = vtk.vtkStringArray()
     mergeNode.GetDisplayNode().GetVisibleSegmentIDs(inputSegmentIDs)
-
-    segmentationEditorWidget.setCurrentSegmentID(inputSegmentIDs.GetValue(0))
-    for i in range(1, inputSegmentIDs.GetNumberOfValues()):
-        segmentID_to_add = inputSegmentIDs.GetValue(i)
-
-        # Combine all segments into one
-        segmentationEditorWidget.setActiveEffectByName("Logical operators")
-        effect = segmentationEditorWidget.activeEffect()
-        effect.setParameter("Operation", "UNION")
-        effect.setParameter("BypassMasking", 1)
-        effect.setParameter("ModifierSegmentID", segmentID_to_add)
-        effect.self().onApply()
-
-        # delete the segment
+    segmentIDs = [inputSegmentIDs.GetValue(i) for i in range(inputSegmentIDs.GetNumberOfValues())]
+
+    # Combine all segments into the first one
+    merged = slicer.util.arrayFromSegmentBinaryLabelmap(mergeNode, segmentIDs[0], volumeNode).astype(bool)
+    for segmentID_to_add in segmentIDs[1:]:
+        np.logical_or(
+            merged, slicer.util.arrayFromSegmentBinaryLabelmap(mergeNode, segmentID_to_add, volumeNode), out=merged
+        )
+    slicer.util.updateSegmentBinaryLabelmapFromArray(merged.astype(np.uint8), mergeNode, segmentIDs[0], volumeNode)
+
+    # delete the merged segments
+    for segmentID_to_add in segmentIDs[1:]:
         mergeNode.GetSegmentation().RemoveSegment(segmentID_to_add)
 
-    # Clean up
-    segmentationEditorWidget = None
-    slicer.mrmlScene.RemoveNode(segmentEditorNode)
-
     if newSegmentationNode:
         return mergeNode
     return None
 
 
-def _fillHole(segmentID: str, segmentationEditorWidget: slicer.qMRMLSegmentEditorWidget, marginSize: int) -> None:
+def _fillHole(
+    segmentationNode: slicer.vtkMRMLSegmentationNode,
+    segmentID: str,
+    volumeNode: slicer.vtkMRMLVolumeNode,
+    marginSize: float,
+    spacing: tuple[float, float, float],
+) -> None:
     """
      Fills internal holes in the segment.
 
+    The segment is closed with the margin (Euclidean dilation followed by erosion) and the holes
+    left in it are filled. This matches the Margin, Invert, Keep Largest Island, Margin and
+    Invert segment editor effects when the exterior of the closed segment is a single connected
+    component, as for a single bone. When the exterior is split, the effects only kept its largest
+    component, while every component connected to the volume border is kept here.
+
+    :param segmentationNode: Segmentation node
     :param segmentID: Segment ID
-    :param segmentationEditorWidget: Segment editor widget
-    :param marginSize: Margin size.
+    :param volumeNode: Reference volume node
+    :param marginSize: Margin size in mm
+    :param spacing: Volume spacing in KJI order
     """
-    segmentationEditorWidget.setCurrentSegmentID(segmentID)
-
-    segmentationEditorWidget.setActiveEffectByName("Margin")
-    effect = segmentationEditorWidget.activeEffect()
-    effect.setParameter("MarginSizeMm", marginSize)
-    effect.self().onApply()
-
-    # Logical operators - Invert
-    segmentationEditorWidget.setActiveEffectByName("Logical operators")
-    effect = segmentationEditorWidget.activeEffect()
-    effect.setParameter("Operation", "INVERT")
-    effect.self().onApply()
-
-    # Island - Keep Largest Island
-    segmentationEditorWidget.setActiveEffectByName("Islands")
-    effect = segmentationEditorWidget.activeEffect()
-    effect.setParameter("Operation", "KEEP_LARGEST_ISLAND")
-    effect.self().onApply()
-
-    # Margin
-    segmentationEditorWidget.setActiveEffectByName("Margin")
-    effect = segmentationEditorWidget.activeEffect()
-    effect.setParameter("MarginSizeMm", marginSize)
-    effect.self().onApply()
-
-    # Logical operators - Invert
-    segmentationEditorWidget.setActiveEffectByName("Logical operators")
-    effect = segmentationEditorWidget.activeEffect()
-    effect.setParameter("Operation", "INVERT")
-    effect.self().onApply()
+    mask = slicer.util.arrayFromSegmentBinaryLabelmap(segmentationNode, segmentID, volumeNode).astype(bool)
+
+    if not mask.any():
+        return
+
+    # Only process the bounding box of the segment, padded so that the closed segment does not reach its border
+    # except where it is clipped by the volume. The result is the same as on the whole volume.
+    padding = [int(np.ceil(marginSize / axisSpacing)) + 1 for axisSpacing in spacing]
+    boundingBox = ndimage.find_objects(mask.view(np.uint8))[0]
+    crop = tuple(
+        slice(max(0, axisSlice.start - axisPadding), min(axisSize, axisSlice.stop + axisPadding))
+        for axisSlice, axisPadding, axisSize in zip(boundingBox, padding, mask.shape)
+    )
+
+    # The margins are thresholded distance maps, which cost the same for any margin size
+    closed = ndimage.distance_transform_edt(~mask[crop], sampling=spacing) <= marginSize
+    filled = np.zeros(mask.shape, dtype=np.uint8)
+    filled[crop] = ndimage.distance_transform_edt(ndimage.binary_fill_holes(closed), sampling=spacing) > marginSize
+
+    slicer.util.updateSegmentBinaryLabelmapFromArray(filled, segmentationNode, segmentID, volumeNode)
 
 
 def _getItemFromFolder(folderName: str) -> slicer.vtkMRMLNode:
@@ -1,4 +1,5 @@
 import os
+from collections.abc import Iterator
 
 
 class ValueErrorsException(Exception):
@@ -26,18 +27,8 @@ def validateInputs(*args: tuple, **kwargs: dict) -> None:
     :param kwargs: dictionary of inputs to validate
     :raises: ValueErrorsException
     """
-    errors = []
-    for arg in args:
-        if arg is None:
-            errors.append("Input argument is None")
-        if isinstance(arg, str) and arg == "":
-            errors.append("Input argument is an empty string")
-
-    for name, arg in kwargs.items():
-        if arg is None:
-            errors.append(f"Input '{name}' is None")
-        if isinstance(arg, str) and arg == "":
-            errors.append(f"Input '{name}' is an empty string")
+    errors = [msg for arg in args for msg in _inputErrors("Input argument", arg)]
+    errors += [msg for name, arg in kwargs.items() for msg in _inputErrors(f"Input '{name}'", arg)]
 
     if len(errors) > 0:
         raise ValueErrorsException(errors)
@@ -51,14 +42,23 @@ def validatePaths(*args: tuple, **kwargs: dict) -> None:
     :param kwargs: list of paths to validate
     :raises: ValueErrorsException
     """
-    errors = []
-    for arg in args:
-        if not os.path.exists(arg):
-            errors.append(f"Input path '{arg}' does not exist")
-
-    for name, path in kwargs.items():
-        if not os.path.exists(path):
-            errors.append(f"Input path '{name}' ({path}) does not exist")
+    _exists = os.path.exists
+    exists = {path: _exists(path) for path in {*args, *kwargs.values()}}  # stat each distinct path once
+    errors = [f"Input path '{arg}' does not exist" for arg in args if not exists[arg]]
+    errors += [f"Input path '{name}' ({path}) does not exist" for name, path in kwargs.items() if not exists[path]]
 
     if len(errors) > 0:
         raise ValueErrorsException(errors)
+
+
+def _inputErrors(label: str, arg: object) -> Iterator[str]:
+    """
+    Yields the validation error for a single input, if any.
+
+    :param label: description of the input used in the error message
+    :param arg: input to validate
+    """
+    if arg is None:
+        yield f"{label} is None"
+    elif isinstance(arg, str) and arg == "":
+        yield f"{label} is an empty string"
@@ -1,5 +1,11 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from math import cos, sin
+from tempfile import mkdtemp
 from typing import Optional
 
+import numpy as np
 import slicer
 import vtk
 from slicer import vtkMRMLScalarVolumeNode, vtkMRMLSequenceNode, vtkMRMLTransformNode
@@ -157,6 +163,8 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
         """
         # Parameter node will be reset, do not use it anymore
         self.setParameterNode(None)
+        # The cached hierarchies reference nodes of the closing scene
+        self.logic.clearRootNodeCache()
 
     def onSceneEndClose(self, _caller, _event) -> None:
         """
@@ -213,7 +221,6 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
             elif not currentCTStatus:  # or not currentRootIDStatus:
                 self.ui.applyButton.text = "Please select a Sequence and Hierarchy"
                 self.ui.applyButton.enabled = False
-        slicer.app.processEvents()
 
     def onApplyButton(self):
         """UI button for running the hierarchical registration."""
@@ -228,6 +235,7 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
                 try:
                     self.inProgress = True
                     self.updateApplyButtonState()
+                    slicer.app.processEvents()  # show the cancel button before the registration starts
 
                     CT = self.ui.inputSelectorCT.currentNode()
                     rootID = self.ui.SubjectHierarchyComboBox.currentItem()
@@ -236,6 +244,7 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
                     endFrame = self.ui.endFrame.value
 
                     trackOnlyRoot = self.ui.onlyTrackRootNodeCheckBox.isChecked()
+                    self.logic.verbose = self.ui.verboseCheckBox.isChecked()
 
                     self.logic.registerSequence(CT, rootID, startFrame, endFrame, trackOnlyRoot)
                 finally:
@@ -245,9 +254,7 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
 
     def onImportButton(self):
         """UI button for reading the TRA files into sequences."""
-        import glob
         import logging
-        import os
 
         with slicer.util.tryWithErrorDisplay("Failed to import transforms", waitCursor=True):
             currentRootIDStatus = self.ui.SubjectHierarchyComboBox.currentItem() != 0
@@ -256,21 +263,29 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
 
             CT = self.ui.inputSelectorCT.currentNode()
             rootID = self.ui.SubjectHierarchyComboBox.currentItem()
-            rootNode = TreeNode(hierarchyID=rootID, ctSequence=CT, isRoot=True)
+            rootNode = self.logic.getRootNode(rootID, CT)
 
             importDir = self.ui.ioDir.currentPath
             if importDir == "":
                 raise ValueError("Import directory not set!")
 
-            node_list = [rootNode]
-            for node in node_list:
+            # List the directory once instead of globbing it for every node. Names are compared with normcase,
+            # so they match like glob, which ignores case on Windows.
+            traFiles = [entry.name for entry in os.scandir(importDir) if os.path.normcase(entry.name).endswith(".tra")]
+
+            nodeQueue = deque([rootNode])
+            while nodeQueue:
+                node = nodeQueue.popleft()
                 node.dataNode.SetAndObserveTransformNodeID(node.getTransform(0).GetID())
-                node_list.extend(node.childNodes)
+                nodeQueue.extend(node.childNodes)
 
-                foundFiles = glob.glob(os.path.join(importDir, f"{node.name}*.tra"))
+                nodePrefix = os.path.normcase(node.name)
+                foundFiles = [
+                    os.path.join(importDir, name) for name in traFiles if os.path.normcase(name).startswith(nodePrefix)
+                ]
                 if len(foundFiles) == 0:
                     logging.warning(f"No files found matching the '{node.name}*.tra' pattern")
-                    return
+                    continue
 
                 if len(foundFiles) > 1:
                     logging.warning(
@@ -289,16 +304,17 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
 
             CT = self.ui.inputSelectorCT.currentNode()
             rootID = self.ui.SubjectHierarchyComboBox.currentItem()
-            rootNode = TreeNode(hierarchyID=rootID, ctSequence=CT, isRoot=True)
+            rootNode = self.logic.getRootNode(rootID, CT)
 
             exportDir = self.ui.ioDir.currentPath
             if exportDir == "":
                 raise ValueError("Export directory not set!")
 
-            node_list = [rootNode]
-            for node in node_list:
+            nodeQueue = deque([rootNode])
+            while nodeQueue:
+                node = nodeQueue.popleft()
                 node.exportTransformsAsTRAFile(exportDir)
-                node_list.extend(node.childNodes)
+                nodeQueue.extend(node.childNodes)
         slicer.util.messageBox("Success!")
 
     def updateFrameSlider(self, CTSelectorNode: slicer.vtkMRMLNode):
@@ -322,7 +338,8 @@ class Hierarchical3DRegistrationWidget(ScriptedLoadableModuleWidget, VTKObservat
 
             CT = self.ui.inputSelectorCT.currentNode()
             rootID = self.ui.SubjectHierarchyComboBox.currentItem()
-            TreeNode(hierarchyID=rootID, ctSequence=CT, isRoot=True)
+            # Rebuild the hierarchy, so that changes made to it since it was cached are picked up
+            self.logic.getRootNode(rootID, CT, rebuild=True)
 
 
 #
@@ -349,6 +366,20 @@ class Hierarchical3DRegistrationLogic(ScriptedLoadableModuleLogic):
         self.cancelRequested = False
         self.isRunning = False
         self._itk = None
+        self._parameterObject = None
+        # Coarse-to-fine schedule of the rigid registration, one shrink factor per axis and level
+        self.imagePyramidSchedule = [8, 8, 8, 4, 4, 4, 2, 2, 2, 1, 1, 1]
+        self.maximumNumberOfIterations = [128, 128, 128, 256]
+        self.numberOfSpatialSamples = 2048
+        # Shorter schedule for warm-started registrations, see registerSequence
+        self._incrementalParameterObject = None
+        self.incrementalImagePyramidSchedule = [2, 2, 2, 1, 1, 1]
+        self.incrementalMaximumNumberOfIterations = [64, 64]
+        self.incrementalNumberOfSpatialSamples = 1024
+        # Write the Elastix log of each registration to a file in the Slicer temporary directory
+        self.verbose = False
+        # Hierarchies built by getRootNode, keyed by (rootID, CT sequence ID)
+        self._rootNodeCache = {}
 
     @property
     def itk(self):
@@ -359,6 +390,78 @@ class Hierarchical3DRegistrationLogic(ScriptedLoadableModuleLogic):
             self._itk = self.importITKElastix()
         return self._itk
 
+    @property
+    def parameterObject(self):
+        """
+        Elastix parameter object with the default rigid parameter map, created on first use.
+
+        The pyramid schedule, iterations per level and metric samples are taken from imagePyramidSchedule,
+        maximumNumberOfIterations and numberOfSpatialSamples, set them before the first registration to override
+        the defaults.
+        """
+        if self._parameterObject is None:
+            self._parameterObject = self.createRigidParameterObject(
+                self.imagePyramidSchedule, self.maximumNumberOfIterations, self.numberOfSpatialSamples
+            )
+        return self._parameterObject
+
+    @property
+    def incrementalParameterObject(self):
+        """Elastix parameter object with the incremental* settings for warm-started registrations, created lazily."""
+        if self._incrementalParameterObject is None:
+            self._incrementalParameterObject = self.createRigidParameterObject(
+                self.incrementalImagePyramidSchedule,
+                self.incrementalMaximumNumberOfIterations,
+                self.incrementalNumberOfSpatialSamples,
+            )
+        return self._incrementalParameterObject
+
+    def getRootNode(self, rootID: int, ctSequence: vtkMRMLSequenceNode, rebuild: bool = False) -> TreeNode:
+        """
+        Returns the hierarchy rooted at rootID for the ct sequence.
+
+        The hierarchy is only built the first time it is requested, or again when rebuild is True
+        or when the subject hierarchy or the nodes of the cached tree have changed, see TreeNode.isUpToDate.
+        """
+        key = (rootID, ctSequence.GetID())
+        rootNode = self._rootNodeCache.get(key)
+        if rebuild or rootNode is None or not rootNode.isUpToDate():
+            rootNode = TreeNode(hierarchyID=rootID, ctSequence=ctSequence, isRoot=True)
+            self._rootNodeCache[key] = rootNode
+        return rootNode
+
+    def clearRootNodeCache(self) -> None:
+        """Forgets the hierarchies built by getRootNode."""
+        self._rootNodeCache.clear()
+
+    def createRigidParameterObject(
+        self,
+        imagePyramidSchedule: list[int],
+        maximumNumberOfIterations: list[int],
+        numberOfSpatialSamples: int,
+    ):
+        """
+        Creates an Elastix parameter object from the default rigid parameter map.
+
+        :param imagePyramidSchedule: Shrink factor of each axis for each resolution level
+        :param maximumNumberOfIterations: Maximum number of iterations for each resolution level
+        :param numberOfSpatialSamples: Number of samples the metric is evaluated on at each iteration
+
+        :return: Elastix parameter object
+        """
+        parameterObject = self.itk.ParameterObject.New()
+        parameterObject.AddParameterMap(parameterObject.GetDefaultParameterMap("rigid"))
+        # parameterObject.AddParameterFile(self.parameterFile)
+        # The default smoothing pyramids do not downsample, the recursive ones smooth and shrink each level
+        parameterObject.SetParameter(0, "FixedImagePyramid", "FixedRecursiveImagePyramid")
+        parameterObject.SetParameter(0, "MovingImagePyramid", "MovingRecursiveImagePyramid")
+        parameterObject.SetParameter(0, "NumberOfResolutions", str(len(maximumNumberOfIterations)))
+        parameterObject.SetParameter(0, "ImagePyramidSchedule", [str(v) for v in imagePyramidSchedule])
+        parameterObject.SetParameter(0, "MaximumNumberOfIterations", [str(v) for v in maximumNumberOfIterations])
+        parameterObject.SetParameter(0, "NumberOfSpatialSamples", str(numberOfSpatialSamples))
+        parameterObject.SetParameter(0, "AutomaticScalesEstimation", "true")
+        return parameterObject
+
     def importITKElastix(self):
         import logging
 
@@ -396,36 +499,83 @@ class Hierarchical3DRegistrationLogic(ScriptedLoadableModuleLogic):
         return Hierarchical3DRegistrationParameterNode(super().getParameterNode())
 
     @staticmethod
-    def parameterObject2SlicerTransform(paramObj) -> slicer.vtkMRMLTransformNode:
-        from math import cos, sin
-
-        import numpy as np
-
-        transformParameters = [float(val) for val in paramObj.GetParameter(0, "TransformParameters")]
-        rx, ry, rz = transformParameters[0:3]
-        tx, ty, tz = transformParameters[3:]
-        centerOfRotation = [float(val) for val in paramObj.GetParameter(0, "CenterOfRotationPoint")]
+    def parameterObject2Matrix(paramObj) -> np.ndarray:
+        """Returns the Euler transform of an Elastix result as a 4x4 RAS matrix."""
+        parameterMap = paramObj.GetParameterMap(0)
+        rx, ry, rz, tx, ty, tz = np.asarray(parameterMap["TransformParameters"], dtype=np.float64)
+        centerOfRotation = np.asarray(parameterMap["CenterOfRotationPoint"], dtype=np.float64)
+
+        # Closed form of rotZ @ rotX @ rotY
+        cx, sx = cos(rx), sin(rx)
+        cy, sy = cos(ry), sin(ry)
+        cz, sz = cos(rz), sin(rz)
+        fixedToMoving = np.empty((4, 4))
+        fixedToMovingDirection = fixedToMoving[0:3, 0:3]  # view, written in place
+        fixedToMovingDirection[0] = (cz * cy - sz * sx * sy, -sz * cx, cz * sy + sz * sx * cy)
+        fixedToMovingDirection[1] = (sz * cy + cz * sx * sy, cz * cx, sz * sy - cz * sx * cy)
+        fixedToMovingDirection[2] = (-cx * sy, sx, cx * cy)
+        fixedToMoving[0:3, 3] = centerOfRotation - fixedToMovingDirection @ centerOfRotation
+        fixedToMoving[0:3, 3] += (tx, ty, tz)
+        fixedToMoving[3] = (0.0, 0.0, 0.0, 1.0)
+
+        # LPS to RAS, same as ras2lps @ fixedToMoving @ ras2lps with ras2lps = diag(-1, -1, 1, 1)
+        fixedToMoving[0:2, 2:4] *= -1
+        fixedToMoving[2:4, 0:2] *= -1
+        return fixedToMoving
 
-        rotX = np.array([[1.0, 0.0, 0.0], [0.0, cos(rx), -sin(rx)], [0.0, sin(rx), cos(rx)]])
-        rotY = np.array([[cos(ry), 0.0, sin(ry)], [0.0, 1.0, 0.0], [-sin(ry), 0.0, cos(ry)]])
-        rotZ = np.array([[cos(rz), -sin(rz), 0.0], [sin(rz), cos(rz), 0.0], [0.0, 0.0, 1.0]])
+    @staticmethod
+    def parameterObject2SlicerTransform(paramObj) -> slicer.vtkMRMLTransformNode:
+        """
+        Returns the Euler transform of an Elastix result as a new transform node added to the scene.
 
-        fixedToMovingDirection = np.dot(np.dot(rotZ, rotX), rotY)
+        Scene node variant of parameterObject2Matrix, for callers that need the result in the scene. The caller
+        owns the node and must remove it. Adding and removing nodes fires scene events, so per registration code
+        such as registerRigidBodies uses parameterObject2Matrix instead.
+        """
+        fixedToMoving = Hierarchical3DRegistrationLogic.parameterObject2Matrix(paramObj)
+        matrix = vtk.vtkMatrix4x4()
+        matrix.DeepCopy(fixedToMoving.ravel().tolist())  # one call instead of setting the 16 elements
+        tfmNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLTransformNode")
+        tfmNode.SetMatrixTransformToParent(matrix)
+        return tfmNode
 
-        fixedToMoving = np.eye(4)
-        fixedToMoving[0:3, 0:3] = fixedToMovingDirection
+    def volumeToITKImage(
+        self,
+        volumeNode: vtkMRMLScalarVolumeNode,
+        parentTransform: Optional[np.ndarray] = None,
+        voxels: Optional[np.ndarray] = None,
+    ):
+        """
+        Converts a scalar volume to a float ITK image in LPS coordinates, without going through a file.
 
-        offset = np.array([tx, ty, tz]) + np.array(centerOfRotation)
-        offset[0] -= np.dot(fixedToMovingDirection[0, :], np.array(centerOfRotation))
-        offset[1] -= np.dot(fixedToMovingDirection[1, :], np.array(centerOfRotation))
-        offset[2] -= np.dot(fixedToMovingDirection[2, :], np.array(centerOfRotation))
-        fixedToMoving[0:3, 3] = offset
-        ras2lps = np.array([[-1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
-        fixedToMoving = np.dot(np.dot(ras2lps, fixedToMoving), ras2lps)
+        :param volumeNode: Volume node
+        :param parentTransform: Optional linear transform to apply to the volume geometry, as a 4x4 RAS matrix.
+            This is the same as hardening the transform on the volume, but leaves the volume node untouched.
+        :param voxels: Voxels of the volume already cast to a contiguous float32 array. Default is None.
 
-        tfmNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLTransformNode")
-        tfmNode.SetMatrixTransformToParent(slicer.util.vtkMatrixFromArray(fixedToMoving))
-        return tfmNode
+        :return: ITK image with the same voxels and geometry as the volume. The voxels may be shared with the volume,
+            so the volume must not be modified while the image is in use.
+        """
+        # Only copied when the voxels need to be cast to float, otherwise the image is a view of the volume voxels
+        if voxels is None:
+            voxels = np.ascontiguousarray(slicer.util.arrayFromVolume(volumeNode), dtype=np.float32)
+        image = self.itk.GetImageViewFromArray(voxels)
+
+        ijkToRAS = vtk.vtkMatrix4x4()
+        volumeNode.GetIJKToRASMatrix(ijkToRAS)
+        ijkToRAS = slicer.util.arrayFromVTKMatrix(ijkToRAS)
+        if parentTransform is not None:
+            ijkToRAS = parentTransform @ ijkToRAS
+        spacing = np.linalg.norm(ijkToRAS[0:3, 0:3], axis=0)
+
+        # RAS to LPS, same as diag(-1, -1, 1, 1) @ ijkToRAS, in place as ijkToRAS is a new array either way
+        ijkToLPS = ijkToRAS
+        ijkToLPS[0:2] *= -1
+
+        image.SetSpacing(spacing.tolist())
+        image.SetOrigin(ijkToLPS[0:3, 3].tolist())
+        image.SetDirection(self.itk.matrix_from_array(ijkToLPS[0:3, 0:3] / spacing))
+        return image
 
     def registerRigidBody(
         self,
@@ -434,53 +584,88 @@ class Hierarchical3DRegistrationLogic(ScriptedLoadableModuleLogic):
         transformNode: vtkMRMLTransformNode,
     ):
         """Registers a partial volume to a CT scan, uses ITKElastix."""
-        from tempfile import NamedTemporaryFile
+        self.registerRigidBodies(CT, [partialVolume], [transformNode])
 
-        # Apply the initial guess if there is one
-        partialVolume.SetAndObserveTransformNodeID(None)
-        partialVolume.SetAndObserveTransformNodeID(transformNode.GetID())
-        partialVolume.HardenTransform()
+    def registerRigidBodies(
+        self,
+        CT: vtkMRMLScalarVolumeNode,
+        partialVolumes: list[vtkMRMLScalarVolumeNode],
+        transformNodes: list[vtkMRMLTransformNode],
+        incremental: bool = False,
+        movingITKImage=None,
+    ):
+        """
+        Registers independent partial volumes to the same CT scan, uses ITKElastix.
 
-        # Register with Elastix
-        with NamedTemporaryFile(suffix=".mha") as movingTempFile, NamedTemporaryFile(suffix=".mha") as fixedTempFile:
-            slicer.util.saveNode(CT, movingTempFile.name)
-            slicer.util.saveNode(partialVolume, fixedTempFile.name)
+        The scene is only modified from the calling thread, the Elastix registrations run
+        concurrently and share the available cores.
 
-            movingITKImage = self.itk.imread(movingTempFile.name, self.itk.F)
-            fixedITKImage = self.itk.imread(fixedTempFile.name, self.itk.F)
+        :param CT: CT volume
+        :param partialVolumes: Partial volumes to register
+        :param transformNodes: Initial guess of each partial volume, updated with the registration result
+        :param incremental: Whether to use incrementalParameterObject, falling back to the full one on failure.
+        :param movingITKImage: CT already converted with volumeToITKImage, to share it between calls. Default is None.
+        """
+        import logging
 
-            paramObj = self.itk.ParameterObject.New()
-            paramObj.AddParameterMap(paramObj.GetDefaultParameterMap("rigid"))
-            # paramObj.AddParameterFile(self.parameterFile)
+        # The initial guesses are applied to the geometry of the fixed images instead of hardening them on the volumes
+        initialGuesses = []
+        for transformNode in transformNodes:
+            initialGuess = vtk.vtkMatrix4x4()
+            transformNode.GetMatrixTransformToWorld(initialGuess)
+            initialGuesses.append(slicer.util.arrayFromVTKMatrix(initialGuess))
 
+        # Register with Elastix
+        if movingITKImage is None:
+            movingITKImage = self.volumeToITKImage(CT)
+        fixedITKImages = [
+            self.volumeToITKImage(partialVolume, initialGuess)
+            for partialVolume, initialGuess in zip(partialVolumes, initialGuesses)
+        ]
+        fullParameterObject = self.parameterObject
+        parameterObject = self.incrementalParameterObject if incremental else fullParameterObject
+        # At most half as many concurrent registrations as cores, each one also holds its own pyramids of the CT
+        cpuCount = os.cpu_count() or 1
+        numberOfWorkers = min(len(fixedITKImages), max(1, cpuCount // 2))
+        numberOfThreads = max(1, cpuCount // numberOfWorkers)
+
+        logDirectories = [None] * len(partialVolumes)
+        if self.verbose:
+            logDirectories = [mkdtemp(prefix="elastix-", dir=slicer.app.temporaryPath) for _ in partialVolumes]
+            for partialVolume, logDirectory in zip(partialVolumes, logDirectories):
+                logging.info(f"Writing the Elastix log of {partialVolume.GetName()} to {logDirectory}")
+
+        def runElastix(fixedITKImage, logDirectory, parameterObject):
             elastixObj = self.itk.ElastixRegistrationMethod.New(fixedITKImage, movingITKImage)
-            elastixObj.SetParameterObject(paramObj)
-            elastixObj.SetNumberOfThreads(16)
-            elastixObj.LogToConsoleOn()  # TODO: Update this to log to file instead
+            elastixObj.SetParameterObject(parameterObject)
+            elastixObj.SetNumberOfThreads(numberOfThreads)
+            elastixObj.LogToConsoleOff()
+            if logDirectory is not None:
+                elastixObj.SetOutputDirectory(logDirectory)
+                elastixObj.LogToFileOn()
+            elastixObj.UpdateLargestPossibleRegion()
+            return elastixObj.GetTransformParameterObject()
+
+        def register(fixedITKImage, logDirectory):
             try:
-                elastixObj.UpdateLargestPossibleRegion()
+                return runElastix(fixedITKImage, logDirectory, parameterObject)
             except Exception:
-                # Remove the hardened initial guess and then throw the exception
-                transformNode.Inverse()
-                partialVolume.SetAndObserveTransformNodeID(transformNode.GetID())
-                partialVolume.HardenTransform()
-                transformNode.Inverse()
-                raise
-
-        resultTransform = self.parameterObject2SlicerTransform(elastixObj.GetTransformParameterObject())
-
-        # Remove the hardened initial guess
-        transformNode.Inverse()
-        partialVolume.SetAndObserveTransformNodeID(transformNode.GetID())
-        partialVolume.HardenTransform()
-        transformNode.Inverse()
-
-        # Combine the initial and result transforms
-        transformNode.SetAndObserveTransformNodeID(resultTransform.GetID())
-        transformNode.HardenTransform()
-
-        # Clean up
-        slicer.mrmlScene.RemoveNode(resultTransform)
+                if parameterObject is fullParameterObject:
+                    raise
+                logging.warning("Incremental registration failed, retrying with the full schedule")
+                return runElastix(fixedITKImage, logDirectory, fullParameterObject)
+
+        with ThreadPoolExecutor(max_workers=numberOfWorkers) as executor:
+            resultParameterObjects = list(executor.map(register, fixedITKImages, logDirectories))
+
+        # Combine the initial and result transforms, same as hardening the result on the transform node
+        # without adding the result to the scene
+        for transformNode, resultParameterObject in zip(transformNodes, resultParameterObjects):
+            initialTransform = vtk.vtkMatrix4x4()
+            transformNode.GetMatrixTransformToParent(initialTransform)
+            resultTransform = self.parameterObject2Matrix(resultParameterObject)
+            combined = resultTransform @ slicer.util.arrayFromVTKMatrix(initialTransform)
+            transformNode.SetMatrixTransformToParent(slicer.util.vtkMatrixFromArray(combined))
 
     def registerSequence(
         self,
@@ -490,43 +675,82 @@ class Hierarchical3DRegistrationLogic(ScriptedLoadableModuleLogic):
         endFrame: int,
         trackOnlyRoot: bool = False,
     ) -> None:
-        """Performs hierarchical registration on a ct sequence."""
+        """
+        Performs hierarchical registration on a ct sequence.
+
+        The nodes of a level of the hierarchy only depend on their parents, so each level is registered at once.
+        The voxels of the next CT frame are cast to float in the background while the current frame is registered.
+        Cancellation requests are handled between frames.
+        """
         import logging
         import time
 
-        rootNode = TreeNode(hierarchyID=rootID, ctSequence=ctSequence, isRoot=True)
+        rootNode = self.getRootNode(rootID, ctSequence)
+
+        # The hierarchy does not change during the registration, so the levels are only collected once
+        levels = [[rootNode]]
+        while not trackOnlyRoot:
+            nextLevel = [childNode for node in levels[-1] for childNode in node.childNodes]
+            if not nextLevel:
+                break
+            levels.append(nextLevel)
+
+        # The scene is only read from this thread, the worker only casts the voxels
+        prefetcher = ThreadPoolExecutor(max_workers=1)
+
+        def prefetchCTFrame(frameIdx):
+            frameNode = ctSequence.GetNthDataNode(frameIdx)
+            voxels = slicer.util.arrayFromVolume(frameNode)
+            return frameNode, prefetcher.submit(np.ascontiguousarray, voxels, dtype=np.float32)
 
         try:
             self.isRunning = True
+            nextCTFrame = prefetchCTFrame(startFrame)
             for idx in range(startFrame, endFrame + 1):
-                nodeList = [rootNode]
-                for node in nodeList:
-                    slicer.app.processEvents()
-                    if self.cancelRequested:
-                        logging.info("User canceled")
-                        self.cancelRequested = False
-                        self.isRunning = False
-                        return
-                    # register
-                    logging.info(f"Registering: {node.name} for frame {idx}")
-                    start = time.time()
-                    self.registerRigidBody(
-                        self.autoscoperLogic.getItemInSequence(ctSequence, idx)[0],
-                        node.dataNode,
-                        node.getTransform(idx),
-                    )
-                    end = time.time()
-                    logging.info(f"{node.name} took {end-start} for frame {idx}.")
-
-                    # Add children to node_list
-                    if not trackOnlyRoot:
-                        node.applyTransformToChildren(idx)
-                        nodeList.extend(node.childNodes)
+                slicer.app.processEvents()
+                if self.cancelRequested:
+                    logging.info("User canceled")
+                    self.cancelRequested = False
+                    self.isRunning = False
+                    return
 
-                    node.dataNode.SetAndObserveTransformNodeID(node.getTransform(idx).GetID())
+                # The frames are the data nodes of the CT sequence, the same nodes are prefetched and registered
+                ctFrameNode, ctVoxels = nextCTFrame
+                ctITKImage = self.volumeToITKImage(ctFrameNode, voxels=ctVoxels.result())  # shared by all levels
+                if idx != endFrame:
+                    nextCTFrame = prefetchCTFrame(idx + 1)
+
+                # Only render the views once the whole frame is registered
+                with slicer.util.RenderBlocker():
+                    for level in levels:
+                        # register
+                        names = ", ".join(node.name for node in level)
+                        logging.info(f"Registering: {names} for frame {idx}")
+                        start = time.time()
+                        self.registerRigidBodies(
+                            ctFrameNode,
+                            [node.dataNode for node in level],
+                            [node.getTransform(idx) for node in level],
+                            # Only the root starts from its own result in the previous frame, so only the root can use
+                            # the shorter schedule with fewer iterations and samples. The children start from the pose
+                            # of their parent and may still be far from their result. The fallback to the full schedule
+                            # only runs when Elastix raises, a poor convergence is not detected.
+                            incremental=level is levels[0] and idx != startFrame,
+                            movingITKImage=ctITKImage,
+                        )
+                        end = time.time()
+                        logging.info(f"{names} took {end-start} for frame {idx}.")
+
+                        for node in level:
+                            # Initialize the children for the next level
+                            if not trackOnlyRoot:
+                                node.applyTransformToChildren(idx)
+
+                            node.dataNode.SetAndObserveTransformNodeID(node.getTransform(idx).GetID())
 
                 if idx != endFrame:  # Unless it's the last frame
                     rootNode.copyTransformToNextFrame(idx)
         finally:
+            prefetcher.shutdown(wait=False, cancel_futures=True)
             self.isRunning = False
             self.cancelRequested = False
@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 import os
 
+import numpy as np
 import slicer
 import vtk
 
@@ -29,12 +30,19 @@ class TreeNode:
         if self.parent is not None and self.isRoot:
             raise ValueError("Node cannot be root and have a parent")
 
-        self.shNode = slicer.mrmlScene.GetSubjectHierarchyNode()
-        self.autoscoperLogic = AutoscoperMLogic()
+        if self.parent is None:
+            self.shNode = slicer.mrmlScene.GetSubjectHierarchyNode()
+            self.autoscoperLogic = AutoscoperMLogic()
+        else:  # Share the helpers of the root across the whole tree
+            self.shNode = self.parent.shNode
+            self.autoscoperLogic = self.parent.autoscoperLogic
 
         self.name = self.shNode.GetItemName(self.hierarchyID)
         self.dataNode = self.shNode.GetItemDataNode(self.hierarchyID)
         self.transformSequence = self._initializeTransforms()
+        # Frames are not added to the sequence after it is initialized, so the guards below use this count
+        self._numFrames = self.transformSequence.GetNumberOfDataNodes()
+        self._browserNode = slicer.modules.sequences.logic().GetFirstBrowserNodeForSequenceNode(self.transformSequence)
 
         children_ids = []
         self.shNode.GetItemChildren(self.hierarchyID, children_ids)
@@ -44,8 +52,6 @@ class TreeNode:
 
     def _initializeTransforms(self) -> slicer.vtkMRMLSequenceNode:
         """Creates a new transform sequence in the same browser as the CT sequence."""
-        import logging
-
         try:
             logging.info(f"Searching for {self.name} transforms")
             newSequenceNode = slicer.util.getNode(f"{self.name}_transform_sequence")
@@ -60,12 +66,17 @@ class TreeNode:
                 newSequenceNode = self.autoscoperLogic.createSequenceNodeInBrowser(
                     f"{self.name}_transform_sequence", self.ctSequence
                 )
-                nodes = []
-                for i in range(self.ctSequence.GetNumberOfDataNodes()):
-                    curTfm = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLinearTransformNode", f"{self.name}-{i}")
-                    newSequenceNode.SetDataNodeAtValue(curTfm, f"{i}")
-                    nodes.append(curTfm)
-                [slicer.mrmlScene.RemoveNode(node) for node in nodes]
+                # The sequence stores a copy of the node, so a single identity transform outside of the scene is
+                # reused for every frame and the sequence only notifies its observers once
+                identityTfm = slicer.vtkMRMLLinearTransformNode()
+                slicer.app.pauseRender()
+                try:
+                    with AutoscoperMLogic.batchModify(newSequenceNode):
+                        for i in range(self.ctSequence.GetNumberOfDataNodes()):
+                            identityTfm.SetName(f"{self.name}-{i}")
+                            newSequenceNode.SetDataNodeAtValue(identityTfm, f"{i}")
+                finally:
+                    slicer.app.resumeRender()
 
                 # Bit of a strange issue but the browser doesn't seem to update unless it moves to a new index,
                 # so we force it to update here
@@ -75,51 +86,87 @@ class TreeNode:
                 slicer.app.processEvents()
         return newSequenceNode
 
+    def isUpToDate(self) -> bool:
+        """
+        Returns whether the tree still matches the subject hierarchy and the nodes of the scene.
+
+        The tree is outdated when an item of the hierarchy was renamed, had its children changed or its data node
+        replaced, or when a volume, transform sequence, browser or proxy node of the tree was removed.
+        """
+        scene = slicer.mrmlScene
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            childrenIDs = []
+            node.shNode.GetItemChildren(node.hierarchyID, childrenIDs)
+            if (
+                node.shNode.GetItemName(node.hierarchyID) != node.name
+                or node.shNode.GetItemDataNode(node.hierarchyID) is not node.dataNode
+                or node.dataNode is None
+                or not scene.IsNodePresent(node.dataNode)
+                or not scene.IsNodePresent(node.transformSequence)
+                or node.transformSequence.GetNumberOfDataNodes() != node._numFrames
+                or node._browserNode is None
+                or not scene.IsNodePresent(node._browserNode)
+                or node._browserNode.GetProxyNode(node.transformSequence) is None
+                or childrenIDs != [childNode.hierarchyID for childNode in node.childNodes]
+            ):
+                return False
+            nodes.extend(node.childNodes)
+        return True
+
+    def _getProxyTransform(self, idx: int) -> slicer.vtkMRMLTransformNode:
+        """Moves the browser to the provided index, if needed, and returns the proxy of the transform sequence."""
+        if self._browserNode.GetSelectedItemNumber() != idx:
+            self._browserNode.SetSelectedItemNumber(idx)
+        return self._browserNode.GetProxyNode(self.transformSequence)
+
     def _applyTransform(self, transform: slicer.vtkMRMLTransformNode, idx: int) -> None:
         """Applies and hardends a transform node to the transform in the sequence at the provided index."""
-        if idx >= self.transformSequence.GetNumberOfDataNodes():
+        if idx >= self._numFrames:
             logging.warning(f"Provided index {idx} is greater than number of data nodes in the sequence.")
             return
-        current_transform = self.autoscoperLogic.getItemInSequence(self.transformSequence, idx)[0]
+        current_transform = self._getProxyTransform(idx)
         current_transform.SetAndObserveTransformNodeID(transform.GetID())
         current_transform.HardenTransform()
 
     def getTransform(self, idx: int) -> slicer.vtkMRMLTransformNode:
         """Returns the transform at the provided index."""
-        if idx >= self.transformSequence.GetNumberOfDataNodes():
+        if idx >= self._numFrames:
             logging.warning(f"Provided index {idx} is greater than number of data nodes in the sequence.")
             return None
-        return self.autoscoperLogic.getItemInSequence(self.transformSequence, idx)[0]
+        return self._getProxyTransform(idx)
 
     def setTransformFromNode(self, transform: slicer.vtkMRMLLinearTransformNode, idx: int) -> None:
         """Sets the transform for the provided index."""
-        if idx >= self.transformSequence.GetNumberOfDataNodes():
+        if idx >= self._numFrames:
             logging.warning(f"Provided index {idx} is greater than number of data nodes in the sequence.")
             return
         mat = vtk.vtkMatrix4x4()
         transform.GetMatrixTransformToParent(mat)
-        current_transform = self.autoscoperLogic.getItemInSequence(self.transformSequence, idx)[0]
+        current_transform = self._getProxyTransform(idx)
         current_transform.SetMatrixTransformToParent(mat)
 
     def setTransformFromMatrix(self, transform: vtk.vtkMatrix4x4, idx: int) -> None:
-        if idx >= self.transformSequence.GetNumberOfDataNodes():
+        if idx >= self._numFrames:
             logging.warning(f"Provided index {idx} is greater than number of data nodes in the sequence.")
             return
-        current_transform = self.autoscoperLogic.getItemInSequence(self.transformSequence, idx)[0]
+        current_transform = self._getProxyTransform(idx)
         current_transform.SetMatrixTransformToParent(transform)
 
     def applyTransformToChildren(self, idx: int) -> None:
         """Applies the transform at the provided index to all children of this node."""
-        if idx >= self.transformSequence.GetNumberOfDataNodes():
+        if idx >= self._numFrames:
             logging.warning(f"Provided index {idx} is greater than number of data nodes in the sequence.")
             return
-        applyTransform = self.autoscoperLogic.getItemInSequence(self.transformSequence, idx)[0]
-        [childNode.setTransformFromNode(applyTransform, idx) for childNode in self.childNodes]
+        # Read the matrix once for all children, each child copies it into its own transform
+        mat = vtk.vtkMatrix4x4()
+        self._getProxyTransform(idx).GetMatrixTransformToParent(mat)
+        for childNode in self.childNodes:
+            childNode.setTransformFromMatrix(mat, idx)
 
     def copyTransformToNextFrame(self, currentIdx: int) -> None:
         """Copies the transform at the provided index to the next frame."""
-        import vtk
-
         currentTransform = self.getTransform(currentIdx)
         transformMatrix = vtk.vtkMatrix4x4()
         currentTransform.GetMatrixTransformToParent(transformMatrix)
@@ -129,13 +176,13 @@ class TreeNode:
 
     def exportTransformsAsTRAFile(self, exportDir: str):
         """Exports the sequence as a TRA file for reading into Autoscoper."""
-        # Convert the sequence to a list of vtkMatrices
-        transforms = []
-        for idx in range(self.transformSequence.GetNumberOfDataNodes()):
-            mat = vtk.vtkMatrix4x4()
-            node = self.getTransform(idx)
-            node.GetMatrixTransformToParent(mat)
-            transforms.append(mat)
+        # Convert the sequence to a (N, 4, 4) array, through a single vtkMatrix
+        transforms = np.empty((self._numFrames, 4, 4))
+        mat = vtk.vtkMatrix4x4()
+        with slicer.util.RenderBlocker():
+            for idx in range(self._numFrames):
+                self.getTransform(idx).GetMatrixTransformToParent(mat)
+                mat.DeepCopy(transforms[idx].ravel(), mat)  # as in slicer.util.arrayFromVTKMatrix, in place
 
         if not os.path.exists(exportDir):
             os.mkdir(exportDir)
@@ -143,9 +190,8 @@ class TreeNode:
         IO.writeTRA(filename, transforms)
 
     def importTransfromsFromTRAFile(self, filename: str):
-        import numpy as np
-
-        tra = np.loadtxt(filename, delimiter=",")
-        tra.resize(tra.shape[0], 4, 4)
-        for idx in range(tra.shape[0]):
-            self.setTransformFromMatrix(slicer.util.vtkMatrixFromArray(tra[idx, :, :]), idx)
+        # One row of 16 values per frame, ndmin keeps a single frame file two dimensional
+        tra = np.loadtxt(filename, delimiter=",", ndmin=2).reshape(-1, 4, 4)
+        with slicer.util.RenderBlocker():
+            for idx in range(tra.shape[0]):
+                self.setTransformFromMatrix(slicer.util.vtkMatrixFromArray(tra[idx, :, :]), idx)